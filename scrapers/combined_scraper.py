@@ -1,47 +1,97 @@
 import requests
 import json
+import orjson
 import trafilatura
-from typing import Tuple, Dict, Any, List, Optional
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Tuple, Dict, Any, List, Optional, Union
+from lxml import etree
+from lxml.html import HtmlElement
+from trafilatura.htmlprocessing import build_html_output
+from trafilatura.utils import normalize_unicode
+from trafilatura.xml import xmltotxt
 from datetime import date
 import psycopg
+from psycopg_pool import ConnectionPool
 import os
-import jsonschema
+import fastjsonschema
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+import atexit
+import copy
+import hashlib
+import multiprocessing
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import threading
+
+# ---------------- Shared HTTP session (keep-alive + retries) ------------
+# Upper bound on concurrent URL fetches in scrape_content; the adapter pool
+# is sized from it so every worker can hold a kept-alive connection.
+_MAX_FETCH_WORKERS = 32
+
+_SESSION = requests.Session()
+# Accept-Encoding is left to requests/urllib3: it advertises "br" whenever the
+# brotli package (see requirements) is importable and decodes it transparently.
+_SESSION.headers.update(
+    {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    }
+)
+_ADAPTER = HTTPAdapter(
+    pool_connections=_MAX_FETCH_WORKERS,
+    pool_maxsize=2 * _MAX_FETCH_WORKERS,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # hand the last response back so raise_for_status() reports the code
+        raise_on_status=False,
+    ),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+
+# Only <meta> tags that can produce a key; the filtering happens inside libxml2.
+_META_XPATH = etree.XPath("//meta[@name != '' or @property != '']")
 
 
 # TODO: Handle 403s
 # see: https://github.com/marksuguitan/beautrafil-scrape/issues/1
-def extract_bs_metadata(html: str) -> Dict[str, Any]:
+def extract_bs_metadata(html: Union[str, bytes, HtmlElement]) -> Dict[str, Any]:
     """
-    Parses HTML with BeautifulSoup and returns a dict of all meta tags.
+    Returns a dict of all meta tags from raw HTML (str or bytes) or an
+    already-parsed lxml tree.
     Keys are meta[@name] or meta[@property], values are their content.
     Also captures <title> if present.
     """
-    soup = BeautifulSoup(html, "lxml")
     bs_meta: Dict[str, Any] = {}
+    tree = trafilatura.load_html(html)
+    if tree is None:
+        return bs_meta
 
-    for tag in soup.find_all("meta"):
-        if tag.get("name"):
-            bs_meta[tag["name"]] = tag.get("content", "").strip()
-        elif tag.get("property"):
-            bs_meta[tag["property"]] = tag.get("content", "").strip()
+    for tag in _META_XPATH(tree):
+        key = tag.get("name") or tag.get("property")
+        bs_meta[key] = (tag.get("content") or "").strip()
 
-    if soup.title and soup.title.string:
-        bs_meta.setdefault("title", soup.title.string.strip())
+    title = tree.find(".//title")
+    if title is not None and title.text:
+        bs_meta.setdefault("title", title.text.strip())
 
     return bs_meta
 
 
-# ---------------- Structured-content presets (one place) ----------------
-_MARKDOWN_OPTS = dict(
-    output_format="markdown",
-    include_links=True,
-    include_formatting=True,
+# ---------------- Extraction presets (one place) ------------------------
+_PLAIN_OPTS = dict(
+    with_metadata=True,
     include_comments=False,
     favor_precision=False,
 )
-_HTML_OPTS = dict(
-    output_format="html",
+# Markdown and HTML share one extraction; only the rendering differs.
+_STRUCTURED_OPTS = dict(
     include_links=True,
     include_formatting=True,
     include_comments=False,
@@ -49,8 +99,70 @@ _HTML_OPTS = dict(
 )
 
 
+# ---------------- Extraction cache (keyed by SHA-256 of the HTML) -------
+_EXTRACT_CACHE_SIZE = 256
+_EXTRACT_CACHE: "OrderedDict[bytes, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+_EXTRACT_CACHE_LOCK = threading.Lock()
+
+
+# ---------------- Extraction process pool (started on first use) -------
+_EXTRACT_POOL: Optional[ProcessPoolExecutor] = None
+_EXTRACT_POOL_LOCK = threading.Lock()
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process-wide pool used for CPU-bound parsing. Workers are
+    spawned rather than forked since the parent is multi-threaded by then.
+    """
+    global _EXTRACT_POOL
+    with _EXTRACT_POOL_LOCK:
+        if _EXTRACT_POOL is None:
+            _EXTRACT_POOL = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_EXTRACT_POOL.shutdown)
+        return _EXTRACT_POOL
+
+
 # ------------------------------------------------------------------------
-def extract_body_and_meta_from_html(html: str) -> Tuple[str, Dict[str, Any]]:
+def extract_body_and_meta_from_html(
+    html: Union[str, bytes],
+    executor: Optional[Executor] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Cached front for _extract_body_and_meta: identical HTML (mirrors, reloads)
+    is only extracted once per process. Callers get their own copy of the
+    result since scrape_content annotates it in place.
+
+    With an executor (e.g. get_extract_pool()), a cache miss is parsed there
+    instead of in the calling thread; if its worker processes can't run
+    (BrokenProcessPool), it is parsed in the calling thread after all.
+    """
+    raw = html if isinstance(html, bytes) else html.encode("utf-8", "surrogatepass")
+    key = hashlib.sha256(raw).digest()
+    with _EXTRACT_CACHE_LOCK:
+        cached = _EXTRACT_CACHE.get(key)
+        if cached is not None:
+            _EXTRACT_CACHE.move_to_end(key)
+    if cached is None:
+        if executor is None:
+            cached = _extract_body_and_meta(html)
+        else:
+            try:
+                cached = executor.submit(_extract_body_and_meta, html).result()
+            except BrokenProcessPool:
+                cached = _extract_body_and_meta(html)
+        with _EXTRACT_CACHE_LOCK:
+            _EXTRACT_CACHE[key] = cached
+            if len(_EXTRACT_CACHE) > _EXTRACT_CACHE_SIZE:
+                _EXTRACT_CACHE.popitem(last=False)
+    plain_text, combined = cached
+    return plain_text, copy.deepcopy(combined)
+
+
+def _extract_body_and_meta(html: Union[str, bytes]) -> Tuple[str, Dict[str, Any]]:
     """
     Returns:
         plain_text,
@@ -67,31 +179,31 @@ def extract_body_and_meta_from_html(html: str) -> Tuple[str, Dict[str, Any]]:
           "trafilatura_metadata":   { ... }
         }
     """
-    # --- BeautifulSoup meta -------------------------------------------------
-    bs_meta = extract_bs_metadata(html)
+    # Parse once; the meta walk and every Trafilatura pass share this tree.
+    tree = trafilatura.load_html(html)
+    if tree is None:
+        tree = html
+
+    # --- BeautifulSoup-style meta -------------------------------------------
+    bs_meta = extract_bs_metadata(tree)
 
     # --- Plain text (+ Trafilatura meta) ------------------------------------
-    json_str = (
-        trafilatura.extract(
-            html,
-            output_format="json",
-            with_metadata=True,
-            include_comments=False,
-            favor_precision=False,
-        )
-        or "{}"
-    )
-    data = json.loads(json_str)
-    plain_text = data.get("text", "")
+    document = trafilatura.bare_extraction(tree, **_PLAIN_OPTS)
+    plain_text = normalize_unicode(document.text) if document else ""
 
     trafil_meta = {
-        k: data.get(k)
-        for k in ("title", "author", "date", "keywords", "description", "source")
+        k: getattr(document, k, None)
+        for k in ("title", "author", "date", "keywords", "description")
     }
+    trafil_meta["source"] = getattr(document, "url", None)
 
     # --- Structured versions (MD + HTML) ------------------------------------
-    structured_md = trafilatura.extract(html, **_MARKDOWN_OPTS) or ""
-    structured_htm = trafilatura.extract(html, **_HTML_OPTS) or ""
+    structured = trafilatura.bare_extraction(tree, **_STRUCTURED_OPTS)
+    if structured:
+        structured_md = normalize_unicode(xmltotxt(structured.body, True).strip())
+        structured_htm = normalize_unicode(build_html_output(structured))
+    else:
+        structured_md = structured_htm = ""
 
     combined = {
         "title": bs_meta.get("title", ""),
@@ -139,13 +251,18 @@ def safe_extract(fn, *args, error_key=None, **kwargs):
         return False, err
 
 
-def extract_from_url(url: str) -> Tuple[str, Dict[str, Any]]:
+def extract_from_url(
+    url: str, executor: Optional[Executor] = None
+) -> Tuple[str, Dict[str, Any]]:
     """
-    Fetches HTML via requests, then runs combined extraction.
+    Fetches HTML via the shared requests session, then runs combined extraction
+    (on executor, if given). The raw bytes are handed over undecoded;
+    lxml/trafilatura detect the encoding themselves, so requests never runs
+    its own charset guess.
     """
-    resp = requests.get(url, timeout=15)
+    resp = _SESSION.get(url, timeout=(5, 15))
     resp.raise_for_status()
-    return extract_body_and_meta_from_html(resp.text)
+    return extract_body_and_meta_from_html(resp.content, executor=executor)
 
 
 def extract_from_file(path: str) -> Tuple[str, Dict[str, Any]]:
@@ -157,55 +274,73 @@ def extract_from_file(path: str) -> Tuple[str, Dict[str, Any]]:
     return extract_body_and_meta_from_html(html)
 
 
+def _canonical_url(url: str) -> str:
+    """
+    Dedup key for a URL: lowercased scheme/host, default port and fragment
+    dropped, query parameters sorted. No parameter is ever removed, since
+    e.g. ?source= or ?keyword= can select a different page.
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    userinfo, at, host = parts.netloc.rpartition("@")
+    host = host.lower()
+    default_port = {"http": ":80", "https": ":443"}.get(scheme)
+    if default_port and host.endswith(default_port):
+        host = host[: -len(default_port)]
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, userinfo + at + host, parts.path, query, ""))
+
+
 def clean_article_title(url_result: Dict[str, Any]) -> None:
     """
     Cleans the title fields in url_result dict if the source is PubMed.
     Modifies url_result in place.
     """
-    url = None
-    trafil_source = url_result.get("trafilatura_metadata", {}).get("source")
-    if trafil_source:
-        url = trafil_source
-    if not url:
-        bs_og_url = url_result.get("beautifulsoup_metadata", {}).get("og:url")
-        if bs_og_url:
-            url = bs_og_url
-    if not url:
-        for k, v in url_result.get("beautifulsoup_metadata", {}).items():
-            if k.endswith("url") and isinstance(v, str) and "pubmed" in v.lower():
-                url = v
-                break
-
-    def _clean(title):
-        if title is None:
-            return title
-        if url and "pubmed" in url.lower():
-            return title.removesuffix(" - PubMed")
-        return title
-
-    if url_result.get("title"):
-        url_result["title"] = _clean(url_result["title"])
-    if "trafilatura_metadata" in url_result and url_result["trafilatura_metadata"].get(
-        "title"
-    ):
-        url_result["trafilatura_metadata"]["title"] = _clean(
-            url_result["trafilatura_metadata"]["title"]
-        )
-    if "beautifulsoup_metadata" in url_result and url_result[
-        "beautifulsoup_metadata"
-    ].get("title"):
-        url_result["beautifulsoup_metadata"]["title"] = _clean(
-            url_result["beautifulsoup_metadata"]["title"]
+    bs_meta = url_result.get("beautifulsoup_metadata") or {}
+    trafil_meta = url_result.get("trafilatura_metadata") or {}
+
+    url = (
+        trafil_meta.get("source")
+        or bs_meta.get("og:url")
+        or next(
+            (
+                v
+                for k, v in bs_meta.items()
+                if k.endswith("url") and isinstance(v, str) and "pubmed" in v.lower()
+            ),
+            None,
         )
+    )
+    if not (url and "pubmed" in url.lower()):
+        return
+
+    suffix = " - PubMed"
+    for target in (url_result, trafil_meta, bs_meta):
+        title = target.get("title")
+        if isinstance(title, str) and title.endswith(suffix):
+            target["title"] = title[: -len(suffix)]
 
 
 def scrape_content(
     urls: Optional[List[str]] = None,
     html_file: Optional[str] = None,
     html_str: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
 ) -> Dict[str, Any]:
     """
-    Scrapes multiple sources using Trafilatura + BeautifulSoup metadata.
+    Scrapes multiple sources using Trafilatura + raw <meta> tag metadata.
+
+    URLs are fetched concurrently on up to ``max_workers`` threads
+    (default: ``_MAX_FETCH_WORKERS``). Pages are parsed in those threads
+    unless an ``executor`` is given; for large batches pass
+    ``get_extract_pool()`` so parsing runs in worker processes. That pool
+    spawns workers which re-import the caller's ``__main__``, so only use it
+    from a real script file whose entry point is behind
+    ``if __name__ == "__main__":``.
 
     Returns a dict with:
       - title: top-level title (prefers html_str > html_file > first URL)
@@ -217,9 +352,31 @@ def scrape_content(
     output: Dict[str, Any] = {}
 
     url_results: List[Dict[str, Any]] = []
-    if urls is not None:
-        for url in urls:
-            _, result = safe_extract(extract_from_url, url, error_key="url")
+    if urls:
+        # Each distinct page is fetched once, even if it is listed several
+        # times under different spellings; the first spelling is the one used.
+        keys = [_canonical_url(url) for url in urls]
+        unique_urls: Dict[str, str] = {}
+        for key, url in zip(keys, urls):
+            unique_urls.setdefault(key, url)
+
+        # Fetch concurrently; the workers share _SESSION's connection pool.
+        workers = min(max_workers or _MAX_FETCH_WORKERS, len(unique_urls))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fetched = dict(
+                zip(
+                    unique_urls,
+                    pool.map(
+                        lambda url: safe_extract(
+                            extract_from_url, url, error_key="url", executor=executor
+                        ),
+                        unique_urls.values(),
+                    ),
+                )
+            )
+        for key in keys:
+            # Duplicates get their own copy since results are edited in place
+            result = copy.deepcopy(fetched[key][1])
             # Add schema_version to each url result
             if isinstance(result, dict):
                 result["schema_version"] = "1"
@@ -248,18 +405,58 @@ def scrape_content(
     return output
 
 
-def validate_output_schema(data: dict, schema_path: str = None):
-    if schema_path is None:
-        schema_path = os.path.join(
-            os.path.dirname(__file__),
-            "..",
-            "data_structures",
-            "V1__scrape_output_schema.json",
-        )
-        schema_path = os.path.abspath(schema_path)
+_SCHEMA_PATH = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "data_structures",
+        "V1__scrape_output_schema.json",
+    )
+)
+
+
+@lru_cache(maxsize=None)
+def _compiled_schema(schema_path: str):
+    """Loads a schema file once and compiles it to a validation function."""
     with open(schema_path, "r") as f:
-        schema = json.load(f)
-    jsonschema.validate(instance=data, schema=schema)
+        return fastjsonschema.compile(json.load(f))
+
+
+def validate_output_schema(data: dict, schema_path: str = None):
+    """
+    Raises fastjsonschema.JsonSchemaValueException if data does not match.
+    """
+    _compiled_schema(schema_path or _SCHEMA_PATH)(data)
+
+
+# ---------------- Postgres connection settings --------------------------
+# Build DSN from environment or default values (read once per process)
+_DB_PARAMS = {
+    "host": os.getenv("PGHOST", "localhost"),
+    "port": os.getenv("PGPORT", "5432"),
+    "dbname": os.getenv("POSTGRES_DB", "mydb"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "postgres"),
+}
+_DSN = " ".join(f"{k}={v}" for k, v in _DB_PARAMS.items())
+
+
+# ---------------- Shared Postgres pool (opened on first save) -----------
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """
+    Returns the process-wide connection pool, opening it on first use so that
+    importing this module (e.g. from run_scraper.sh) never touches the DB.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConnectionPool(_DSN, min_size=2, max_size=10, open=True)
+            atexit.register(_POOL.close)
+        return _POOL
 
 
 def save_scraped_data(scraped: Dict[str, Any]) -> None:
@@ -267,72 +464,74 @@ def save_scraped_data(scraped: Dict[str, Any]) -> None:
     Saves the scraped data into the database.
     Uses similar functionality to db.py.
     """
-    # Build DSN from environment or default values
-    DB_PARAMS = {
-        "host": os.getenv("PGHOST", "localhost"),
-        "port": os.getenv("PGPORT", "5432"),
-        "dbname": os.getenv("POSTGRES_DB", "mydb"),
-        "user": os.getenv("POSTGRES_USER", "postgres"),
-        "password": os.getenv("POSTGRES_PASSWORD", "postgres"),
-    }
-    DSN = " ".join(f"{k}={v}" for k, v in DB_PARAMS.items())
-
     # TODO: #7 Determine the the overall scraped schema
     # --- Add validation here ---
-    if "urls" in scraped:
-        for url_result in scraped["urls"]:
-            validate_output_schema(url_result)
-
-    if "html_file" in scraped:
-        validate_output_schema(scraped["html_file"])
+    validate = _compiled_schema(_SCHEMA_PATH)
+    for result in (
+        *scraped.get("urls", ()),
+        *(scraped[k] for k in ("html_file", "html_str") if k in scraped),
+    ):
+        validate(result)
 
+    # Use scraped data with priority: html_str > html_file > first URL result
     if "html_str" in scraped:
-        validate_output_schema(scraped["html_str"])
-
-    with psycopg.connect(DSN) as conn:
+        record = scraped["html_str"]
+    elif "html_file" in scraped:
+        record = scraped["html_file"]
+    elif "urls" in scraped and scraped["urls"]:
+        record = scraped["urls"][0]
+    else:
+        record = {"title": "No Title", "content": ""}
+
+    with _get_pool().connection() as conn:
         with conn.cursor() as cur:
-            # Use scraped data with priority: html_str > html_file > first URL result
-            if "html_str" in scraped:
-                record = scraped["html_str"]
-            elif "html_file" in scraped:
-                record = scraped["html_file"]
-            elif "urls" in scraped and scraped["urls"]:
-                record = scraped["urls"][0]
-            else:
-                record = {"title": "No Title", "content": ""}
-
-            title = ""
-            content = ""
-            cur.execute(
-                """
-                INSERT INTO documents
-                  (title, content)
-                VALUES
-                  (%(title)s, %(content)s)
-                RETURNING id;
-                """,
-                {
-                    "title": title,
-                    "content": content,
-                },
-            )
-            document_id = cur.fetchone()[0]
-            print("▶ Created document:", document_id)
-
-            cur.execute(
-                """
-                INSERT INTO raw_documents
-                  (document_id, version_number, raw_data)
-                VALUES
-                  (%(document_id)s, %(version_number)s, %(raw_data)s);
-                """,
-                {
-                    "document_id": document_id,
-                    "version_number": 1,
-                    "raw_data": json.dumps(record),
-                },
-            )
-            print("▶ Inserted raw_documents v1 for:", document_id)
+            _insert_records(cur, [record])
+
+
+def _insert_records(cur: psycopg.Cursor, records: List[Dict[str, Any]]) -> List[int]:
+    """
+    Inserts one documents row plus its raw_documents v1 row per record.
+    A data-modifying CTE chains both inserts into one statement, and
+    executemany pipelines that statement over all records, so the whole
+    batch costs a single round trip. Returns the new document ids.
+    """
+    if not records:
+        return []
+
+    cur.executemany(
+        """
+        WITH doc AS (
+          INSERT INTO documents
+            (title, content)
+          VALUES
+            (%(title)s, %(content)s)
+          RETURNING id
+        )
+        INSERT INTO raw_documents
+          (document_id, version_number, raw_data)
+        VALUES
+          ((SELECT id FROM doc), %(version_number)s, %(raw_data)s)
+        RETURNING document_id;
+        """,
+        [
+            {
+                "title": "",
+                "content": "",
+                "version_number": 1,
+                "raw_data": orjson.dumps(record).decode(),
+            }
+            for record in records
+        ],
+        returning=True,
+    )
+    document_ids: List[int] = []
+    while True:
+        document_ids.append(cur.fetchone()[0])
+        if not cur.nextset():
+            break
+    for document_id in document_ids:
+        print("▶ Created document + raw_documents v1:", document_id)
+    return document_ids
 
 
 if __name__ == "__main__":
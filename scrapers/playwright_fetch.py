@@ -1,22 +1,24 @@
-import asyncio, random, time
-from typing import Iterable
+import asyncio, atexit, random, re, threading, time
+from typing import Dict, List, Optional, Set, Tuple, Union
 from pathlib import Path
-from playwright.async_api import async_playwright, Response, Route
-from playwright_stealth import stealth_async
+import httpx
+from trafilatura.utils import decode_file
+from playwright.async_api import async_playwright, Browser, Response, Route
+from playwright_stealth.stealth import StealthConfig
 
 # --------------------------------------------------------------------------- #
 # Configuration helpers
 # --------------------------------------------------------------------------- #
 
 # A small pool of realistic desktop + mobile user agents; extend as you like.
-UA_POOL: Iterable[str] = [
+UA_POOL: Tuple[str, ...] = (
     # Chrome desktop
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
     "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
     # Chrome mobile
     "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 "
     "(KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36",
-]
+)
 
 # File extensions we *usually* don’t need for text extraction
 MEDIA_EXTENSIONS = (
@@ -37,17 +39,159 @@ MEDIA_EXTENSIONS = (
     ".ttf",
     ".eot",
 )
+# Route patterns are matched by the Playwright driver, so only requests that
+# will be aborted (or a navigation that happens to match, which _abort_route
+# lets through) cross over into Python. Trackers are matched on the host.
+MEDIA_URL_PATTERN = re.compile(
+    r"\.(?:%s)(?:[?#]|$)"
+    % "|".join(re.escape(ext.lstrip(".")) for ext in MEDIA_EXTENSIONS),
+    re.IGNORECASE,
+)
+TRACKER_URL_PATTERN = re.compile(
+    r"^https?://(?:[^/?#]+\.)?(?:google-analytics\.com|doubleclick\.net"
+    r"|googletagmanager\.com|facebook\.net|hotjar\.com)(?::\d+)?/",
+    re.IGNORECASE,
+)
+
+# playwright_stealth's evasions as one init script (what stealth_async()
+# registers piece by piece on each page), built once at import.
+_STEALTH_JS = "\n;\n".join(StealthConfig().enabled_scripts)
+
+# smart_fetch() keeps a plain-HTTP response when it already looks like a
+# server-rendered page: at least this many bytes and <p> elements.
+STATIC_MIN_BYTES = 5_000
+STATIC_MIN_PARAGRAPHS = 5
+_PARAGRAPH_TAG = re.compile(rb"<p[\s>]", re.IGNORECASE)
+
+# Navigation statuses worth a retry, and the backoff schedule (seconds)
+RETRY_STATUSES = frozenset({403, 429})
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Chromium flags for long-running headless batches (shared /dev/shm is tiny in
+# containers, no GPU, and hide the `AutomationControlled` blink feature).
+LAUNCH_ARGS = (
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-blink-features=AutomationControlled",
+)
+
+# --------------------------------------------------------------------------- #
+# Browser pool
+# --------------------------------------------------------------------------- #
+
+
+class PlaywrightPool:
+    """
+    Keeps Playwright and a few Chromium processes alive across many fetches.
+
+    Each fetch gets a fresh context + page on one of the pooled browsers and
+    only that context is closed afterwards. Browsers are handed out
+    round-robin and relaunched after *max_pages_per_browser* pages to bound
+    Chromium's memory growth.
+
+        async with PlaywrightPool(size=2) as pool:
+            html = await pool.fetch(url, stealth=True)
+
+    Chromium and Playwright are only shut down when the pool is closed, so
+    keep one pool around for the whole batch (or program).
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        *,
+        max_concurrency: Optional[int] = None,
+        max_pages_per_browser: int = 100,
+    ):
+        self.size = size
+        self.max_pages_per_browser = max_pages_per_browser
+        self._sem = asyncio.Semaphore(max_concurrency or size)
+        self._rotate_lock = asyncio.Lock()
+        self._pw = None
+        self._browsers: List[Browser] = []
+        self._next_slot = 0
+        self._served: Dict[Browser, int] = {}
+        self._in_flight: Dict[Browser, int] = {}
+        self._retiring: Set[Browser] = set()
+
+    async def start(self) -> "PlaywrightPool":
+        self._pw = await async_playwright().start()
+        self._browsers = [await self._launch() for _ in range(self.size)]
+        return self
+
+    async def __aenter__(self) -> "PlaywrightPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        for browser in (*self._browsers, *self._retiring):
+            await browser.close()
+        self._browsers.clear()
+        self._retiring.clear()
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+    async def fetch(self, url: str, **opts) -> str:
+        """Render *url* on a pooled browser; *opts* as for `_render_page`."""
+        async with self._sem:
+            browser = await self._acquire()
+            try:
+                return await _render_page(browser, url, **opts)
+            finally:
+                await self._release(browser)
+
+    # ----- internals ------------------------------------------------------------
+    async def _launch(self) -> Browser:
+        browser = await self._pw.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        self._served[browser] = 0
+        self._in_flight[browser] = 0
+        return browser
+
+    async def _acquire(self) -> Browser:
+        async with self._rotate_lock:
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % len(self._browsers)
+            browser = self._browsers[slot]
+            if self._served[browser] >= self.max_pages_per_browser:
+                # swap in a fresh browser; the old one closes once drained
+                self._retiring.add(browser)
+                browser = self._browsers[slot] = await self._launch()
+                await self._close_if_drained(self._retiring)
+            self._served[browser] += 1
+            self._in_flight[browser] += 1
+            return browser
+
+    async def _release(self, browser: Browser) -> None:
+        self._in_flight[browser] -= 1
+        await self._close_if_drained({browser} & self._retiring)
+
+    async def _close_if_drained(self, browsers: Set[Browser]) -> None:
+        for browser in list(browsers):
+            # skip browsers another task closed while we awaited a close()
+            if browser in self._retiring and self._in_flight.get(browser) == 0:
+                self._retiring.discard(browser)
+                del self._served[browser], self._in_flight[browser]
+                await browser.close()
+
 
 # --------------------------------------------------------------------------- #
 # Core async worker
 # --------------------------------------------------------------------------- #
 
 
-async def _fetch_html_async(
+async def _render_page(
+    browser: Browser,
     url: str,
     *,
-    wait_until: str = "networkidle",
+    wait_until: str = "domcontentloaded",
+    wait_selector: Optional[str] = None,
+    timeout_ms: int = 10_000,
     scroll: bool = True,
+    scroll_steps: int = 1,
     stealth: bool = False,
     block_media: bool = False,
     retry_403: bool = False,
@@ -57,62 +201,207 @@ async def _fetch_html_async(
     Fetch fully rendered HTML with optional anti-bot, stealth and media-blocking.
 
     * stealth=True     → random UA, realistic locale/viewport/timezone, WebGL tricks
-    * block_media=True → abort requests for images/video/fonts
-    * retry_403=True   → if first visit yields 403, retry w/ alt UA + no-cache headers
+    * block_media=True → abort requests for images/video/fonts + common trackers
+    * retry_403=True   → if the visit yields 403/429, back off and retry (up to
+                         *max_retries*) w/ alt UA + no-cache headers
+    * wait_selector    → after DOMContentLoaded, also wait for this selector to be
+                         attached (callers that relied on the old "networkidle"
+                         default should pass the selector of the content they need)
+    * timeout_ms       → default timeout for every page action, so one slow page
+                         can't stall a batch
+    * scroll_steps     → >1 for sites whose intersection observers need the
+                         viewport to pass through the page rather than jump
+
+    Runs in its own context on *browser*; the context (not the browser) is
+    closed when done.
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
+    # ----- build context options ------------------------------------------------
+    context_opts = {}
+    if stealth:
+        context_opts |= {
+            "user_agent": random.choice(UA_POOL),
+            "locale": "en-US",
+            "timezone_id": "America/New_York",
+            "viewport": {"width": 1366, "height": 768},
+            # ↓ fingerprint tweaks
+            "color_scheme": "light",
+        }
+
+    context = await browser.new_context(**context_opts)
+    try:
+        # ----- request interception ---------------------------------------------
+        # On the context, before any page exists: one registration covers the
+        # page plus any popups it opens.
+        if block_media:
+            await context.route(MEDIA_URL_PATTERN, _abort_route)
+            await context.route(TRACKER_URL_PATTERN, _abort_route)
 
-        # ----- build context options ------------------------------------------------
-        context_opts = {}
+        # ── DEEPER stealth patch (optional) ──────────────────────────────────
         if stealth:
-            context_opts |= {
-                "user_agent": random.choice(tuple(UA_POOL)),
-                "locale": "en-US",
-                "timezone_id": "America/New_York",
-                "viewport": {"width": 1366, "height": 768},
-                # ↓ fingerprint tweaks
-                "color_scheme": "light",
-            }
+            # masks WebGL, navigator.plugins, etc. for every page in the context
+            await context.add_init_script(_STEALTH_JS)
 
-        context = await browser.new_context(**context_opts)
         page = await context.new_page()
+        page.set_default_timeout(timeout_ms)
 
-        # ── DEEPER stealth patch (optional) ──────────────────────────────────
-        if stealth:
-            await stealth_async(page)  # masks WebGL, navigator.plugins, etc.
+        # ----- main navigation --------------------------------------------------
+        resp = await page.goto(url, wait_until=wait_until)
+        if retry_403:
+            await _retry_blocked(page, resp, wait_until, max_retries)
+        if wait_selector:
+            await page.wait_for_selector(wait_selector, state="attached")
 
-        # ----- request interception -------------------------------------------------
-        if block_media:
-            await page.route(
-                "**/*",
-                lambda route: _maybe_abort_media(route, MEDIA_EXTENSIONS),
-            )
+        if scroll:
+            await _auto_scroll(page, scroll_steps)
 
-        if retry_403:
-            await _inject_403_retry_logic(page, max_retries)
+        return await page.content()
+    finally:
+        await context.close()
 
-        # ----- main navigation ------------------------------------------------------
-        await page.goto(url, wait_until=wait_until)
 
-        if scroll:
-            await _auto_scroll(page)
+async def _fetch_many_async(
+    urls: List[str], concurrency: int, browsers: int, **kwargs
+) -> List[Union[str, BaseException]]:
+    async with PlaywrightPool(size=browsers, max_concurrency=concurrency) as pool:
+        return await asyncio.gather(
+            *(pool.fetch(url, **kwargs) for url in urls), return_exceptions=True
+        )
+
 
-        html = await page.content()
-        await browser.close()
-        return html
+async def fetch_in_page(page, urls: List[str], batch_size: int = 25) -> List[dict]:
+    """
+    Fetch *urls* with the browser's own fetch() from inside an already loaded
+    (e.g. logged-in) *page*, so every request carries its cookies, CSRF
+    tokens and clearance cookies without a navigation per URL.
+
+    Each batch of *batch_size* URLs is one `page.evaluate` round-trip. Returns
+    one dict per URL in input order: {url, status, body} on a response,
+    {url, error} if the fetch itself failed. Bodies are the raw (unrendered)
+    responses.
+    """
+    results: List[dict] = []
+    for i in range(0, len(urls), batch_size):
+        results += await page.evaluate(
+            """
+            async (urls) => Promise.all(urls.map(async (u) => {
+                try {
+                    const r = await fetch(u, {credentials: 'include'});
+                    return {url: u, status: r.status, body: await r.text()};
+                } catch (e) {
+                    return {url: u, error: String(e)};
+                }
+            }))
+            """,
+            urls[i : i + batch_size],
+        )
+    return results
+
+
+async def smart_fetch(
+    url: str, client: httpx.AsyncClient, pool: PlaywrightPool, **opts
+) -> str:
+    """
+    Tiered fetch: try a plain GET on *client* first and only render *url* on
+    *pool* (*opts* as for `_render_page`) when that fails or the response
+    looks like a JS shell rather than server-rendered HTML. Static pages
+    skip Chromium (V8 startup, layout, paint) entirely.
+    """
+    try:
+        r = await client.get(url, follow_redirects=True)
+    except httpx.HTTPError:
+        r = None
+    if (
+        r is not None
+        and r.status_code == 200
+        and len(r.content) >= STATIC_MIN_BYTES
+        and len(_PARAGRAPH_TAG.findall(r.content)) >= STATIC_MIN_PARAGRAPHS
+    ):
+        if r.charset_encoding:
+            return r.text
+        # no charset header: httpx would assume UTF-8 and ignore <meta charset>
+        return decode_file(r.content)
+    return await pool.fetch(url, **opts)
 
 
 # --------------------------------------------------------------------------- #
-# Public sync wrapper
+# Public sync wrappers
 # --------------------------------------------------------------------------- #
 
 
+def fetch_many(
+    urls: List[str],
+    concurrency: int = 20,
+    *,
+    browsers: int = 1,
+    **kwargs,
+) -> List[Union[str, BaseException]]:
+    """
+    Render a batch of URLs on one event loop and one PlaywrightPool, with up
+    to *concurrency* pages in flight across *browsers* Chromium processes.
+    *kwargs* are passed to every fetch (stealth=, block_media=, ...).
+
+    Returns the HTML per URL in input order; a URL that failed yields the
+    exception instead, so one bad page doesn't sink the batch.
+    """
+    return asyncio.run(_fetch_many_async(urls, concurrency, browsers, **kwargs))
+
+
+# fetch_html() runs on one long-lived event loop (in a daemon thread) with one
+# PlaywrightPool, both started on first use and shut down at interpreter exit.
+_bg_lock = threading.Lock()
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_thread: Optional[threading.Thread] = None
+_bg_pool: Optional[PlaywrightPool] = None
+
+
+def _background_pool() -> Tuple[asyncio.AbstractEventLoop, PlaywrightPool]:
+    global _bg_loop, _bg_thread, _bg_pool
+    with _bg_lock:
+        if _bg_pool is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="playwright-fetch", daemon=True
+            )
+            thread.start()
+            try:
+                pool = asyncio.run_coroutine_threadsafe(
+                    PlaywrightPool().start(), loop
+                ).result()
+            except BaseException:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise
+            _bg_loop, _bg_thread, _bg_pool = loop, thread, pool
+            atexit.register(_close_background_pool)
+        return _bg_loop, _bg_pool
+
+
+def _close_background_pool() -> None:
+    global _bg_loop, _bg_thread, _bg_pool
+    with _bg_lock:
+        if _bg_pool is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(_bg_pool.close(), _bg_loop).result()
+        finally:
+            _bg_loop.call_soon_threadsafe(_bg_loop.stop)
+            _bg_thread.join()
+            _bg_loop.close()
+            _bg_loop = _bg_thread = _bg_pool = None
+
+
 def fetch_html(
     url: str,
     **kwargs,
 ) -> str:
-    return asyncio.run(_fetch_html_async(url, **kwargs))
+    """
+    Render a single URL (*kwargs* as for `_render_page`). Successive calls
+    share one event loop, Playwright instance and Chromium process, so only
+    the first call pays for the startup; use fetch_many() for batches.
+    """
+    loop, pool = _background_pool()
+    return asyncio.run_coroutine_threadsafe(pool.fetch(url, **kwargs), loop).result()
 
 
 # --------------------------------------------------------------------------- #
@@ -120,61 +409,70 @@ def fetch_html(
 # --------------------------------------------------------------------------- #
 
 
-async def _auto_scroll(page):
-    """Quick ‘scroll to bottom’ helper to trigger lazy loads."""
+async def _auto_scroll(page, steps: int = 1):
+    """
+    ‘Scroll to bottom’ helper to trigger lazy loads: *steps* evenly spaced
+    jumps, each followed by one frame + 250ms settle, in a single round-trip.
+    """
     await page.evaluate(
         """
-        () => new Promise(res => {
-            const dist = 1024, delay = 40;
-            let scrolled = 0;
-            const timer = setInterval(() => {
-                window.scrollBy(0, dist);
-                scrolled += dist;
-                if (scrolled >= document.body.scrollHeight) {
-                    clearInterval(timer);
-                    setTimeout(res, 400);
-                }
-            }, delay);
-        })
-        """
+        async (steps) => {
+            const settle = () =>
+                new Promise(res => requestAnimationFrame(() => setTimeout(res, 250)));
+            for (let i = 1; i <= steps; i++) {
+                window.scrollTo(0, document.body.scrollHeight * i / steps);
+                await settle();
+            }
+        }
+        """,
+        steps,
     )
 
 
-def _maybe_abort_media(route: Route, banned_exts: Iterable[str]):
-    """Abort media/font requests to save bandwidth."""
-    url = route.request.url.lower()
-    if any(url.endswith(ext) for ext in banned_exts):
-        return asyncio.create_task(route.abort())
-    return asyncio.create_task(route.continue_())
+async def _abort_route(route: Route):
+    """
+    Abort media/font/tracker requests to save bandwidth. Navigations are let
+    through, so a page whose own URL matches a pattern still loads.
+    """
+    if route.request.is_navigation_request():
+        await route.continue_()
+    else:
+        await route.abort()
 
 
-async def _inject_403_retry_logic(page, max_retries: int):
+async def _retry_blocked(
+    page, resp: Optional[Response], wait_until: str, max_retries: int
+) -> Optional[Response]:
     """
-    Listens for 403 responses. If encountered, it:
-      1. Cancels further loading
+    While the navigation response *resp* is a 403/429 (up to *max_retries*):
+      1. Waits (Retry-After if the server sent seconds, else exponential
+         backoff with full jitter so parallel workers don't retry in lockstep)
       2. Picks a new UA + adds ‘Cache-Control: no-cache’
-      3. Retries navigation (up to *max_retries*)
+      3. Navigates again with the caller's *wait_until*
+    A Retry-After above BACKOFF_CAP gives up instead of holding the pool slot.
+    Returns the last navigation response.
     """
-    attempts = {"count": 0}
-
-    async def on_response(resp: Response):
-        if resp.status != 403:
-            return
-        if attempts["count"] >= max_retries:
-            return
-        attempts["count"] += 1
-
-        print(f"[403] Retry #{attempts['count']} for {resp.url}")
-        # Pick a fresh UA
-        new_ua = random.choice(tuple(UA_POOL))
-        await page.context.set_extra_http_headers({"Cache-Control": "no-cache"})
-        await page.context.set_user_agent(new_ua)
-
-        # Small back-off before retrying
-        await asyncio.sleep(0.8 * attempts["count"])
-        await page.goto(resp.url, wait_until="networkidle")
-
-    page.on("response", on_response)
+    attempt = 0
+    while resp is not None and resp.status in RETRY_STATUSES and attempt < max_retries:
+        attempt += 1
+        retry_after = resp.headers.get("retry-after", "")
+        if retry_after.isdigit():
+            if int(retry_after) > BACKOFF_CAP:
+                print(f"[{resp.status}] Retry-After {retry_after}s, giving up")
+                break
+            delay = int(retry_after) + random.uniform(0, 0.5)
+        else:
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+        print(f"[{resp.status}] Retry #{attempt} for {resp.url}")
+        # Pick a fresh UA (BrowserContext has no set_user_agent; send it as a header)
+        new_ua = random.choice(UA_POOL)
+        await page.context.set_extra_http_headers(
+            {"Cache-Control": "no-cache", "User-Agent": new_ua}
+        )
+        await asyncio.sleep(delay)
+        resp = await page.goto(resp.url, wait_until=wait_until)
+    return resp
 
 
 # --------------------------------------------------------------------------- #
@@ -211,5 +509,7 @@ if __name__ == "__main__":
     host = urlparse(url).hostname.replace(".", "_")
     out_file = out_dir / f"{host}-{ts}.html"
 
-    out_file.write_text(html, encoding="utf-8")
+    # encode once and write the bytes as-is (no text-layer newline translation)
+    out_file.write_bytes(html.encode("utf-8"))
+    del html
     print(f"Saved rendered HTML →  {out_file.relative_to(project_root)}")
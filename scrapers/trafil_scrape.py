@@ -1,14 +1,37 @@
-import requests
-import json
-from trafilatura import fetch_url, extract
-
-#  Use beautifulsoup4 for more complete handling of metadata
-## <meta name="…" content="…"> and <meta property="…" content="…">
-## for tag in soup.find_all('meta'):
-##     if tag.get('name'):
-##         meta[tag['name']] = tag.get('content', '').strip()
-##     elif tag.get('property'):
-##         meta[tag['property']] = tag.get('content', '').strip()
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import shelve
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+import orjson
+from trafilatura import extract
+
+# Metadata-only fast path (<meta name/property> + <title>, no extraction
+# pipeline): use quick_meta(html) instead of extract(..., with_metadata=True)
+# when the text itself isn't needed.
+from combined_scraper import extract_bs_metadata as quick_meta
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# Used for the single retry pass over failed URLs
+RETRY_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36",
+}
+
+# Extraction cache (shelve files), shared across runs; see `scrape`.
+CACHE_PATH = Path(__file__).resolve().parent.parent / ".scrape_cache"
 
 urls = [
     "https://example.com/some-article",
@@ -17,35 +40,182 @@ urls = [
     # ... list of URLs to scrape
 ]
 
-results = []
-for url in urls:
-    # Fetch the URL content (Trafilatura has fetch_url, or use requests)
-    downloaded = fetch_url(url)  # this does an HTTP get with proper headers
-    # Alternatively: downloaded = requests.get(url, timeout=10).text
-
-    if not downloaded:
-        continue  # skip if failed to fetch
-
-    # Extract main content & metadata
-    result = extract(downloaded, url=url, output_format="json", with_metadata=True)
-    if result:
-        data = json.loads(result)
-    else:
-        data = {}
-
-    # Collect relevant fields
-    results.append(
-        {
-            "url": url,
-            "title": data.get("title"),
-            "author": data.get("author"),
-            "date": data.get("date"),
-            "text": data.get("text"),
-            # "images": data.get("images"),    # if include_images was True in extract()
-            # "links": data.get("links"),      # if include_links was True
-        }
-    )
-
-# Now 'results' is a list of dicts with the extracted info.
-# You can print them or save to a file/DB as needed.
-print(json.dumps(results, indent=2))
+
+class Download(NamedTuple):
+    body: Optional[bytes]  # None → 304, the cached extraction is still valid
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+@dataclass(slots=True)
+class Article:
+    """The fields kept per scraped URL (orjson serializes it as an object)."""
+
+    url: str
+    title: Optional[str]
+    author: Optional[str]
+    date: Optional[str]
+    text: Optional[str]
+    # images: Optional[list]  # if include_images was True in extract()
+    # links: Optional[list]   # if include_links was True
+
+
+async def fetch_all(
+    urls: List[str],
+    concurrency: int = 50,
+    cached: Optional[Dict[str, Dict[str, Any]]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> List[Any]:
+    """
+    Download all URLs concurrently over one HTTP/2 client (requests to the
+    same host are multiplexed over a pooled connection), at most
+    *concurrency* at a time. URLs with a *cached* entry are fetched conditionally
+    (If-None-Match / If-Modified-Since); *headers* override HEADERS.
+    Returns a Download per URL (input order), or the exception raised for
+    that URL.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    cached = cached or {}
+
+    async with httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        headers={**HEADERS, **(headers or {})},
+        timeout=15.0,
+        follow_redirects=True,
+    ) as client:
+
+        async def bounded(url: str) -> Download:
+            conditional_headers = {}
+            if entry := cached.get(url):
+                if entry["etag"]:
+                    conditional_headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    conditional_headers["If-Modified-Since"] = entry["last_modified"]
+            async with sem:
+                r = await client.get(url, headers=conditional_headers)
+            if r.status_code != 304:  # httpx treats a 304 as an error status
+                r.raise_for_status()
+            body = None if r.status_code == 304 else r.content
+            return Download(body, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+
+        return await asyncio.gather(
+            *(bounded(url) for url in urls), return_exceptions=True
+        )
+
+
+def _extract(downloaded: bytes, url: str) -> Optional[str]:
+    """Top-level (picklable) so it can run in the extraction process pool."""
+    return extract(downloaded, url=url, output_format="json", with_metadata=True)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Network errors, timeouts, 5xx and blocks (403/429) are worth a retry."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status >= 500 or status in (403, 429)
+    return isinstance(exc, httpx.TransportError)
+
+
+def _cache_key(url: str) -> str:
+    return hashlib.sha1(url.encode()).hexdigest()
+
+
+async def scrape(
+    urls: List[str],
+    concurrency: int = 50,
+    cache_path: Path = CACHE_PATH,
+    executor: Optional[Executor] = None,
+) -> List[Article]:
+    """
+    Fetch + extract every URL. Extractions are persisted in *cache_path*
+    alongside the response's ETag/Last-Modified, so a repeat run only
+    revalidates unchanged pages instead of downloading and extracting them.
+
+    Extraction runs on *executor* if given (e.g. a process pool for large
+    batches, see __main__), else in a worker thread; if the executor's
+    processes can't run (BrokenProcessPool) it falls back to a thread.
+    """
+    loop = asyncio.get_running_loop()
+    urls = list(dict.fromkeys(urls))  # drop duplicates, keep order
+    with shelve.open(str(cache_path)) as cache:
+        cached = {url: cache.get(_cache_key(url)) for url in urls}
+        downloads = await fetch_all(urls, concurrency, cached)
+
+        # One more pass for transient failures, under a different UA
+        failed = [
+            url
+            for url, download in zip(urls, downloads)
+            if isinstance(download, BaseException) and _is_retryable(download)
+        ]
+        if failed:
+            retried = dict(
+                zip(
+                    failed,
+                    await fetch_all(failed, concurrency, cached, RETRY_HEADERS),
+                )
+            )
+            downloads = [retried.get(url, d) for url, d in zip(urls, downloads)]
+
+        async def extract_one(url: str, download: Download) -> Optional[str]:
+            if download.body is None:
+                return cached[url]["data"]
+            if executor is not None:
+                try:
+                    return await loop.run_in_executor(
+                        executor, _extract, download.body, url
+                    )
+                except BrokenProcessPool:
+                    pass
+            return await asyncio.to_thread(_extract, download.body, url)
+
+        fetched = [
+            (url, download)
+            for url, download in zip(urls, downloads)
+            if not isinstance(download, BaseException)  # skip if failed to fetch
+        ]
+        extracted = await asyncio.gather(
+            *(extract_one(url, download) for url, download in fetched)
+        )
+
+        for (url, download), result in zip(fetched, extracted):
+            if download.body is not None and (download.etag or download.last_modified):
+                cache[_cache_key(url)] = {
+                    "etag": download.etag,
+                    "last_modified": download.last_modified,
+                    "data": result,
+                }
+
+    results = []
+    for (url, _), result in zip(fetched, extracted):
+        data = orjson.loads(result) if result else {}
+
+        # Collect relevant fields
+        results.append(
+            Article(
+                url,
+                data.get("title"),
+                data.get("author"),
+                data.get("date"),
+                data.get("text"),
+            )
+        )
+    return results
+
+
+if __name__ == "__main__":
+    # Extraction is CPU-bound pure Python; worker processes (spawned lazily on
+    # first submit) let it use every core instead of queuing on the GIL.
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        results = asyncio.run(scrape(urls, executor=pool))
+
+    # Now 'results' is a list of Articles with the extracted info.
+    # Stream them out as JSON Lines (one object per line; redirect to a file
+    # or pipe into a DB loader as needed).
+    out = sys.stdout.buffer
+    for result in results:
+        out.write(orjson.dumps(result))
+        out.write(b"\n")
+    out.flush()